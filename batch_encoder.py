@@ -26,93 +26,113 @@ Example JSON format:
 
 import os
 import sys
-import json
-import re
 import argparse
-from pddl_encoder import PDDLEncoder, PDDL_KEYWORDS
+import logging
+from contextlib import ExitStack
+from functools import partial
+from multiprocessing import Pool
+from pddl_encoder import PDDLEncoder
+from json_io import dumps, load as load_json
+
+logger = logging.getLogger(__name__)
+
+# Report progress at INFO level once every this many entries
+PROGRESS_INTERVAL = 100
 
 def process_pddl_string(encoder, pddl_string):
     """Process a PDDL string and return the encoded version."""
-    # Pattern to match PDDL names (identifiers)
-    name_pattern = r'\b([a-zA-Z][a-zA-Z0-9_-]*)\b'
+    # Replace names with encoded versions
+    return encoder.encode_string(pddl_string)
+
+# Write buffer size for the streamed JSON outputs
+_WRITE_BUFFER_SIZE = 1 << 20
+
+def write_json_item(f, obj, first):
+    """Append an object to a JSON array that is being streamed to a binary file."""
+    if not first:
+        f.write(b',')
+    f.write(dumps(obj))
+
+def process_one_entry(item, stochastic=False, seed=None):
+    """Encode a single (entry_id, entry) batch item.
+
+    Returns the encoded output entry and its encoding map entry.
+    """
+    i, entry = item
     
-    def replace_name(match):
-        name = match.group(1)
-        if name.lower() in PDDL_KEYWORDS:
-            return name
-        return encoder.encode_name(name)
+    # Create a new encoder for each entry to ensure clean encoding
+    encoder = PDDLEncoder(stochastic=stochastic, seed=seed)
     
-    # Replace names with encoded versions
-    return re.sub(name_pattern, replace_name, pddl_string)
+    # Get PDDL code from the JSON structure
+    domain_code = entry.get('instruction', '')
+    problem_code = entry.get('input', '')
+    plan_code = entry.get('output', '')
+    
+    # Process domain, problem and plan PDDL code
+    encoded_domain = process_pddl_string(encoder, domain_code) if domain_code else ''
+    encoded_problem = process_pddl_string(encoder, problem_code) if problem_code else ''
+    encoded_plan = process_pddl_string(encoder, plan_code) if plan_code else ''
+    
+    # Prepare output entry
+    output_entry = {
+        "instruction": encoded_domain,
+        "input": encoded_problem,
+        "output": encoded_plan
+    }
+    map_entry = {
+        "entry_id": i,
+        "encoding_map": encoder.encoding_map
+    }
+    return output_entry, map_entry
+
+def process_json_batch(json_file, output_dir, stochastic=False, seed=None, workers=None):
+    """Process a batch of PDDL code specified in a JSON file.
 
-def process_json_batch(json_file, output_dir, stochastic=False, seed=None):
-    """Process a batch of PDDL code specified in a JSON file."""
+    Entries are independent, so they are encoded in parallel across
+    `workers` processes (all CPUs by default, no pool if 1).
+    """
     # Create output directory if it doesn't exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
     # Load the JSON file
-    with open(json_file, 'r') as f:
-        batch_data = json.load(f)
+    batch_data = load_json(json_file)
     
-    # Prepare output data structures
-    encoded_data = []
-    encoding_maps = []
+    encoded_data_path = os.path.join(output_dir, "encoded_data.json")
+    encoding_maps_path = os.path.join(output_dir, "encoding_maps.json")
     
-    # Process each entry in the batch
-    for i, entry in enumerate(batch_data):
-        print(f"\nProcessing entry {i+1}/{len(batch_data)}")
-        
-        # Create a new encoder for each entry to ensure clean encoding
-        encoder = PDDLEncoder(stochastic=stochastic, seed=seed)
-        
-        # Get PDDL code from the JSON structure
-        domain_code = entry.get('instruction', '')
-        problem_code = entry.get('input', '')
-        plan_code = entry.get('output', '')
-        
-        # Process domain PDDL code
-        encoded_domain = process_pddl_string(encoder, domain_code) if domain_code else ''
-        print(f"Encoded domain PDDL code")
-        
-        # Process problem PDDL code
-        encoded_problem = process_pddl_string(encoder, problem_code) if problem_code else ''
-        print(f"Encoded problem PDDL code")
-        
-        # Process plan PDDL code
-        encoded_plan = process_pddl_string(encoder, plan_code) if plan_code else ''
-        print(f"Encoded plan PDDL code")
-        
-        # Prepare output entry
-        output_entry = {
-            "instruction": encoded_domain,
-            "input": encoded_problem,
-            "output": encoded_plan
-        }
+    encode_entry = partial(process_one_entry, stochastic=stochastic, seed=seed)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(batch_data))
+    
+    # Stream each entry to the output files as soon as it is encoded,
+    # so only one entry is held in memory at a time
+    with open(encoded_data_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as data_f, \
+            open(encoding_maps_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as maps_f, \
+            ExitStack() as stack:
+        if workers > 1:
+            pool = stack.enter_context(Pool(workers))
+            # Ordered imap keeps the output position equal to the entry id
+            results = pool.imap(encode_entry, enumerate(batch_data), chunksize=16)
+        else:
+            results = map(encode_entry, enumerate(batch_data))
         
-        # Get encoding map as string
-        map_content = '\n'.join([f"{original}\t{encoded}" for original, encoded in encoder.encoding_map.items()])
+        data_f.write(b'[')
+        maps_f.write(b'[')
         
-        # Add to output data structures
-        encoded_data.append(output_entry)
-        encoding_maps.append({
-            "entry_id": i,
-            "encoding_map": encoder.encoding_map
-        })
+        for i, (output_entry, map_entry) in enumerate(results):
+            write_json_item(data_f, output_entry, first=(i == 0))
+            write_json_item(maps_f, map_entry, first=(i == 0))
+            logger.debug("Processed entry %d/%d", i + 1, len(batch_data))
+            if (i + 1) % PROGRESS_INTERVAL == 0:
+                logger.info("Processed %d/%d entries", i + 1, len(batch_data))
         
-        print(f"Processed entry {i+1}")
+        data_f.write(b']')
+        maps_f.write(b']')
     
-    # Save the encoded data JSON
-    encoded_data_path = os.path.join(output_dir, "encoded_data.json")
-    with open(encoded_data_path, 'w') as f:
-        json.dump(encoded_data, f, indent=4)
-    print(f"\nSaved encoded data to: {encoded_data_path}")
-    
-    # Save the encoding maps JSON
-    encoding_maps_path = os.path.join(output_dir, "encoding_maps.json")
-    with open(encoding_maps_path, 'w') as f:
-        json.dump(encoding_maps, f, indent=4)
-    print(f"Saved encoding maps to: {encoding_maps_path}")
+    logger.info("Saved encoded data to: %s", encoded_data_path)
+    logger.info("Saved encoding maps to: %s", encoding_maps_path)
 
 def main():
     parser = argparse.ArgumentParser(description='Batch process PDDL code specified in a JSON file.')
@@ -120,15 +140,18 @@ def main():
     parser.add_argument('--output-dir', default='example/encoded', help='Directory for output encoded files')
     parser.add_argument('--stochastic', action='store_true', help='Use stochastic encoding')
     parser.add_argument('--seed', type=int, help='Random seed for reproducible stochastic encoding')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Report progress for every entry')
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format='%(message)s')
     
     # Convert relative paths to absolute paths
     script_dir = os.path.dirname(os.path.abspath(__file__))
     output_dir = os.path.join(script_dir, args.output_dir) if not os.path.isabs(args.output_dir) else args.output_dir
     
     # Process the batch
-    process_json_batch(args.json_file, output_dir, args.stochastic, args.seed)
+    process_json_batch(args.json_file, output_dir, args.stochastic, args.seed, args.workers)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -9,54 +9,167 @@ with the original PDDL code.
 
 import os
 import sys
-import json
 import re
 import argparse
+import logging
+from functools import lru_cache
+from json_io import dumps, load as load_json
 
-def decode_pddl_string(encoded_string, encoding_map):
-    """Decode an encoded PDDL string back to its original form using the encoding map."""
-    import re
+logger = logging.getLogger(__name__)
+
+# Report progress at INFO level once every this many entries
+PROGRESS_INTERVAL = 100
+
+# Splits a string into alternating separator and word token chunks
+_TOKEN_RE = re.compile(r'(\w+)')
+# Matches a name made only of word characters
+_WORD_RE = re.compile(r'\w+')
+
+def _is_word_char(c):
+    """Check whether a character counts as a word character for token boundaries."""
+    return c.isalnum() or c == '_'
+
+@lru_cache(maxsize=16)
+def _compile_indexed_pattern(prefix):
+    """Compile a pattern matching any prefix + integer id token."""
+    # [0-9] rather than \d, which would also match non-ASCII digits that int() accepts
+    return re.compile(r'\b' + re.escape(prefix) + r'([0-9]+)\b')
+
+def _build_decode_array(encoding_map):
+    """Index the original names by id when every encoded name is prefix + integer id.
+
+    This is the shape produced by non-stochastic encoding (x0, x1, ...).
+    Returns (prefix, originals) or None if the map has any other shape.
+    """
+    prefix = None
+    ids = []
+    for encoded in encoding_map:
+        digits = encoded[len(encoded.rstrip('0123456789')):]
+        # Only canonical ids (no leading zeros) can be recovered from their integer value
+        if not digits or (digits[0] == '0' and len(digits) > 1):
+            return None
+        if prefix is None:
+            prefix = encoded[:-len(digits)]
+            if not prefix or not _is_word_char(prefix[0]):
+                return None
+        elif len(encoded) - len(digits) != len(prefix) or not encoded.startswith(prefix):
+            return None
+        ids.append(int(digits))
     
-    # Start with the encoded string
-    decoded_string = encoded_string
+    # Avoid allocating huge mostly-empty arrays for sparse ids
+    if max(ids) >= 2 * len(ids) + 64:
+        return None
     
-    # Replace each encoded name with its original name
-    # Sort by length in descending order to avoid partial replacements
-    for encoded, original in sorted(encoding_map.items(), key=lambda x: len(x[0]), reverse=True):
-        # Use word boundaries to ensure we're replacing complete tokens
-        decoded_string = re.sub(r'\b' + re.escape(encoded) + r'\b', original, decoded_string)
+    originals = [None] * (max(ids) + 1)
+    for idx, original in zip(ids, encoding_map.values()):
+        originals[idx] = original
+    return prefix, originals
+
+class PDDLDecoder:
+    """Decode PDDL strings that share one encoding map.
     
-    return decoded_string
+    The replacement pattern is compiled once, so the same decoder can be
+    applied to the domain, problem and plan of an entry.
+    """
+
+    def __init__(self, encoding_map):
+        self.encoding_map = encoding_map
+        self.pattern = None
+        self.originals = None
+        self.word_names = False
+        if not encoding_map:
+            return
+        
+        indexed = _build_decode_array(encoding_map)
+        if indexed is not None:
+            # Names are prefix + id: match them with one small pattern and index by id
+            prefix, self.originals = indexed
+            self.pattern = _compile_indexed_pattern(prefix)
+        elif all(_WORD_RE.fullmatch(encoded) for encoded in encoding_map):
+            # Complete tokens made of word characters are exactly the \w+ runs,
+            # so a generic tokenizer plus map lookups needs no per-map pattern
+            self.word_names = True
+        else:
+            # Fall back to a single alternation of all encoded names, for maps
+            # not produced by batch_encoder whose names contain other characters
+            # Sort by length in descending order to avoid partial replacements
+            keys = sorted(encoding_map, key=len, reverse=True)
+            # Use word boundaries to ensure we're replacing complete tokens
+            self.pattern = re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in keys) + r')\b')
+
+    def _replace(self, match):
+        """Regex substitution callback that decodes a matched name."""
+        return self.encoding_map[match.group(0)]
+
+    def _replace_indexed(self, match):
+        """Regex substitution callback that decodes a prefix + id name by its id."""
+        digits = match.group(1)
+        if digits[0] != '0' or len(digits) == 1:
+            idx = int(digits)
+            if idx < len(self.originals):
+                original = self.originals[idx]
+                if original is not None:
+                    return original
+        # Not an encoded name, leave it untouched
+        return match.group(0)
+
+    def _decode_word_tokens(self, encoded_string):
+        """Replace word tokens that are encoded names, leaving all others as they are."""
+        parts = _TOKEN_RE.split(encoded_string)
+        get_original = self.encoding_map.get
+        # Tokens are at the odd indices of the split result
+        parts[1::2] = [get_original(token, token) for token in parts[1::2]]
+        return ''.join(parts)
+
+    def __call__(self, encoded_string):
+        """Replace each encoded name in the string with its original name."""
+        if self.word_names:
+            return self._decode_word_tokens(encoded_string)
+        if self.pattern is None:
+            return encoded_string
+        if self.originals is not None:
+            return self.pattern.sub(self._replace_indexed, encoded_string)
+        return self.pattern.sub(self._replace, encoded_string)
+
+def normalize_encoding_maps(encoding_maps):
+    """Convert encoding maps stored as tab-separated text to {original: encoded} dicts, in place."""
+    for map_entry in encoding_maps:
+        encoding_map = map_entry["encoding_map"]
+        if isinstance(encoding_map, str):
+            map_entry["encoding_map"] = dict(line.split('\t', 1) for line in encoding_map.splitlines() if line)
+    return encoding_maps
+
+def decode_pddl_string(encoded_string, encoding_map):
+    """Decode an encoded PDDL string back to its original form using the encoding map."""
+    return PDDLDecoder(encoding_map)(encoded_string)
 
 def decode_json_batch(encoded_data_file, encoding_maps_file, output_file):
     """Decode a batch of encoded PDDL code specified in JSON files."""
     # Load the encoded data
-    with open(encoded_data_file, 'r') as f:
-        encoded_data = json.load(f)
+    encoded_data = load_json(encoded_data_file)
     
     # Load the encoding maps
-    with open(encoding_maps_file, 'r') as f:
-        encoding_maps = json.load(f)
+    encoding_maps = normalize_encoding_maps(load_json(encoding_maps_file))
     
     # Prepare output data structure
     decoded_data = []
     
+    # Index the encoding maps by entry id
+    maps_by_id = {m["entry_id"]: m for m in encoding_maps}
+    
     # Process each entry in the batch
     for i, entry in enumerate(encoded_data):
-        print(f"\nDecoding entry {i+1}/{len(encoded_data)}")
+        logger.debug("Decoding entry %d/%d", i + 1, len(encoded_data))
         
         # Get the encoding map for this entry
-        map_entry = next((m for m in encoding_maps if m["entry_id"] == i), None)
+        map_entry = maps_by_id.get(i)
         if not map_entry:
-            print(f"ERROR: No encoding map found for entry {i}")
+            logger.error("No encoding map found for entry %d", i)
             continue
         
-        # Parse the encoding map
-        encoding_map = {}
-        for line in map_entry["encoding_map"].split('\n'):
-            if line.strip():
-                original, encoded = line.split('\t')
-                encoding_map[encoded] = original
+        # Invert the stored {original: encoded} map
+        encoding_map = {encoded: original for original, encoded in map_entry["encoding_map"].items()}
+        decoder = PDDLDecoder(encoding_map)
         
         # Get encoded PDDL code from the JSON structure
         encoded_domain = entry.get('instruction', '')
@@ -64,14 +177,9 @@ def decode_json_batch(encoded_data_file, encoding_maps_file, output_file):
         encoded_plan = entry.get('output', '')
         
         # Decode PDDL code
-        decoded_domain = decode_pddl_string(encoded_domain, encoding_map) if encoded_domain else ''
-        print(f"Decoded domain PDDL code")
-        
-        decoded_problem = decode_pddl_string(encoded_problem, encoding_map) if encoded_problem else ''
-        print(f"Decoded problem PDDL code")
-        
-        decoded_plan = decode_pddl_string(encoded_plan, encoding_map) if encoded_plan else ''
-        print(f"Decoded plan PDDL code")
+        decoded_domain = decoder(encoded_domain) if encoded_domain else ''
+        decoded_problem = decoder(encoded_problem) if encoded_problem else ''
+        decoded_plan = decoder(encoded_plan) if encoded_plan else ''
         
         # Prepare output entry
         output_entry = {
@@ -83,20 +191,23 @@ def decode_json_batch(encoded_data_file, encoding_maps_file, output_file):
         # Add to output data structure
         decoded_data.append(output_entry)
         
-        print(f"Decoded entry {i+1}")
+        if (i + 1) % PROGRESS_INTERVAL == 0:
+            logger.info("Decoded %d/%d entries", i + 1, len(encoded_data))
     
     # Save the decoded data JSON
-    with open(output_file, 'w') as f:
-        json.dump(decoded_data, f, indent=4)
-    print(f"\nSaved decoded data to: {output_file}")
+    with open(output_file, 'wb') as f:
+        f.write(dumps(decoded_data, indent=True))
+    logger.info("Saved decoded data to: %s", output_file)
 
 def main():
     parser = argparse.ArgumentParser(description='Decode batch of encoded PDDL code specified in JSON files.')
     parser.add_argument('encoded_data', help='JSON file containing encoded PDDL code')
     parser.add_argument('encoding_maps', help='JSON file containing encoding maps')
     parser.add_argument('output_file', help='Output JSON file for decoded PDDL code')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Report progress for every entry')
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format='%(message)s')
     
     # Convert relative paths to absolute paths
     script_dir = os.path.dirname(os.path.abspath(__file__))
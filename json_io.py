@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+JSON helpers for the batch PDDL tools.
+
+Uses orjson for parsing and serialization when it is installed and falls
+back to the standard json module otherwise. All output is UTF-8 encoded
+bytes, so files should be opened in binary mode.
+"""
+
+import os
+import json
+import mmap
+
+try:
+    # Optional: C parser and serializer, much faster than the standard json module
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional: incremental parser for streaming large JSON arrays
+    import ijson
+except ImportError:
+    ijson = None
+
+# Read buffer size for JSON input files
+READ_BUFFER_SIZE = 1 << 20
+
+# Files at least this large are memory-mapped when parsing with orjson
+MMAP_THRESHOLD = 1 << 20
+
+def load(path):
+    """Read and parse a JSON file."""
+    with open(path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            # orjson parses straight from the mapped file, without a bytes copy
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+        data = f.read()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def iter_items(path):
+    """Iterate over the items of a JSON array file.
+
+    Items are parsed one at a time with ijson when it is installed, so only
+    the current item is held in memory; otherwise the whole file is loaded.
+    """
+    if ijson is None:
+        yield from load(path)
+        return
+    with open(path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+        yield from ijson.items(f, 'item')
+
+def dumps(obj, indent=False):
+    """Serialize an object to JSON bytes, optionally pretty-printed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    # Match orjson's output byte for byte: 2-space indent, compact separators, raw UTF-8
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
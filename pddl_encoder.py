@@ -10,13 +10,14 @@ Supports reversible encoding and stochastic encoding for LLM training.
 import re
 import os
 import sys
+import mmap
 import random
 import string
 import argparse
 from typing import Dict, List, Tuple, Set, Optional, Union
 
 # PDDL keywords that should not be encoded
-PDDL_KEYWORDS = {
+PDDL_KEYWORDS = frozenset({
     # PDDL requirements
     'strips', 'typing', 'negative-preconditions', 'disjunctive-preconditions',
     'equality', 'existential-preconditions', 'universal-preconditions',
@@ -46,12 +47,38 @@ PDDL_KEYWORDS = {
     'number', 'object',
     # Operators and symbols
     '=', '<', '>', '<=', '>=', '+', '-', '*', '/', '(', ')', '-', '?',
-}
+})
+
+# Pattern to match PDDL names (identifiers)
+# This is a simplified pattern and might need refinement
+# Word boundaries stay Unicode-aware so they agree with the decoders' \w and \b;
+# a name ends on a word character not followed by another one, so a trailing '-'
+# is never taken into a name that a (non-ASCII) word character follows
+_NAME_RE = re.compile(r'\b([a-zA-Z](?:[a-zA-Z0-9_-]*[a-zA-Z0-9_])?)(?!\w)')
+
+# Files at least this large are memory-mapped instead of read into a bytes copy
+_MMAP_THRESHOLD = 1 << 20
+
+
+def _read_text(path: str) -> str:
+    """Read a UTF-8 text file, decoding the raw bytes once.
+
+    Skips the text layer's newline translation, and decodes large files
+    straight from a memory map so no intermediate bytes copy is made.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < _MMAP_THRESHOLD:
+            return f.read().decode('utf-8')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, 'utf-8')
 
 
 class PDDLEncoder:
     """A class to encode names in PDDL files with support for reversible and stochastic encoding."""
 
+    # Precomputed string forms of small ids, cheaper than formatting each new name
+    _INT_STR: List[str] = [str(i) for i in range(4096)]
+
     def __init__(self, stochastic: bool = False, seed: Optional[int] = None):
         self.encoding_map: Dict[str, str] = {}
         self.decoding_map: Dict[str, str] = {}
@@ -74,10 +101,20 @@ class PDDLEncoder:
 
     def encode_name(self, name: str) -> str:
         """Encode a name if it's not already encoded."""
-        # Don't encode if it's a keyword or already encoded
-        if name.lower() in PDDL_KEYWORDS or name in self.encoding_map:
-            return self.encoding_map.get(name, name)
+        # Reuse the existing encoding with a single dict lookup
+        cached = self.encoding_map.get(name)
+        if cached is not None:
+            return cached
+
+        # Don't encode keywords (they are never inserted into the map)
+        # Most names are already lowercase, so try them as-is before calling lower()
+        if name in PDDL_KEYWORDS or name.lower() in PDDL_KEYWORDS:
+            return name
+
+        return self._register_name(name)
 
+    def _register_name(self, name: str) -> str:
+        """Generate a unique encoding for a new name and record it in the maps."""
         while True:
             if self.stochastic:
                 # Expand capacity if needed
@@ -93,9 +130,10 @@ class PDDLEncoder:
                 else:
                     prefix = self.random_state.choice(string.ascii_lowercase)
 
-                encoded_name = f"{prefix}{number}"
+                encoded_name = prefix + self._INT_STR[number]
             else:
-                encoded_name = f"{self.prefix}{self.next_id}"
+                next_id = self.next_id
+                encoded_name = self.prefix + (self._INT_STR[next_id] if next_id < len(self._INT_STR) else str(next_id))
 
             # Check for collision
             if encoded_name not in self.decoding_map:
@@ -109,20 +147,39 @@ class PDDLEncoder:
         self.decoding_map[encoded_name] = name
         self.next_id += 1
         return encoded_name
+
+    def encode_string(self, content: str) -> str:
+        """Encode all names in a PDDL string.
+
+        The regex engine splits the text into alternating separator and name
+        chunks in a single pass, so Python only does the map lookups.
+        """
+        parts = _NAME_RE.split(content)
+        get_encoded = self.encoding_map.get
+        # Names are at the odd indices of the split result
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            encoded_name = get_encoded(name)
+            if encoded_name is None:
+                if name in PDDL_KEYWORDS or name.lower() in PDDL_KEYWORDS:
+                    continue
+                encoded_name = self._register_name(name)
+            parts[i] = encoded_name
+        return ''.join(parts)
         
     def decode_name(self, encoded_name: str) -> str:
         """Decode an encoded name back to its original form."""
         # If it's a keyword or not in our decoding map, return as is
-        if encoded_name.lower() in PDDL_KEYWORDS:
+        if encoded_name in PDDL_KEYWORDS or encoded_name.lower() in PDDL_KEYWORDS:
             return encoded_name
             
         return self.decoding_map.get(encoded_name, encoded_name)
 
     def save_encoding_map(self, output_file: str):
         """Save the encoding map to a file."""
+        lines = [f"{original}\t{encoded}\n" for original, encoded in self.encoding_map.items()]
         with open(output_file, 'w') as f:
-            for original, encoded in self.encoding_map.items():
-                f.write(f"{original}\t{encoded}\n")
+            f.write(''.join(lines))
 
     def load_encoding_map(self, input_file: str):
         """Load the encoding map from a file."""
@@ -229,24 +286,13 @@ class PDDLEncoder:
 
     def _process_with_regex(self, input_file: str, output_file: str) -> None:
         """Process a PDDL file using regex patterns when pddl library is not available."""
-        with open(input_file, 'r') as f:
-            content = f.read()
-        
-        # Pattern to match PDDL names (identifiers)
-        # This is a simplified pattern and might need refinement
-        name_pattern = r'\b([a-zA-Z][a-zA-Z0-9_-]*)\b'
-        
-        def replace_name(match):
-            name = match.group(1)
-            if name.lower() in PDDL_KEYWORDS:
-                return name
-            return self.encode_name(name)
+        content = _read_text(input_file)
         
         # Replace names with encoded versions
-        encoded_content = re.sub(name_pattern, replace_name, content)
+        encoded_content = self.encode_string(content)
         
-        with open(output_file, 'w') as f:
-            f.write(encoded_content)
+        with open(output_file, 'wb') as f:
+            f.write(encoded_content.encode('utf-8'))
 
 
     def decode_pddl_file(self, input_file: str, output_file: str) -> None:
@@ -10,44 +10,110 @@ This script tests:
 
 import os
 import sys
-import json
-import tempfile
-import subprocess
 import argparse
-import shutil
+import atexit
+import threading
+from contextlib import ExitStack
 from pddl_encoder import PDDLEncoder, PDDL_KEYWORDS
+# The process pool, subprocess, tempfile, asyncio and batch_encoder are imported inside
+# the tests that need them, so a single-worker reversibility run loads none of them
+from decode_batch import PDDLDecoder, normalize_encoding_maps
+from json_io import iter_items as iter_json_items, load as load_json
 
-# Function to decode PDDL string using encoding map
-def decode_pddl_string(encoded_string, encoding_map):
-    """Decode an encoded PDDL string back to its original form using the encoding map."""
-    # The encoding_map is already in the format {encoded: original}
+# Create temporary directories on tmpfs when available, so file creation and removal stay in memory
+_TEMP_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+
+# Background threads removing temporary directories
+_cleanup_threads = []
+
+def _remove_dir_in_background(path):
+    """Remove a directory tree in a background thread so the caller can return immediately."""
+    import shutil
     
-    # Start with the encoded string
+    thread = threading.Thread(target=shutil.rmtree, args=(path,), kwargs={'ignore_errors': True}, daemon=True)
+    thread.start()
+    _cleanup_threads.append(thread)
+
+@atexit.register
+def _wait_for_cleanups():
+    """Let pending temporary directory removals finish before the interpreter exits."""
+    for thread in _cleanup_threads:
+        thread.join()
+
+def _build_decoder(encoding_map):
+    """Build a decoder for an {original: encoded} encoding map."""
+    return PDDLDecoder({encoded: original for original, encoded in encoding_map.items()})
+
+def _strip_bounds(s):
+    """Return the (start, end) indices of a string without surrounding whitespace."""
+    start, end = 0, len(s)
+    # PDDL text only has a few whitespace characters at its ends, so these loops are short
+    while start < end and s[start].isspace():
+        start += 1
+    while end > start and s[end - 1].isspace():
+        end -= 1
+    return start, end
+
+def _stripped_eq(a, b):
+    """Check if two strings are equal ignoring surrounding whitespace.
     
-    # Replace each encoded name with its original name
-    # Sort by length in descending order to avoid partial replacements
-    for original, encoded in encoding_map.items():
-        encoded_string = encoded_string.replace(encoded, original)
-        # Use word boundaries to ensure we're replacing complete tokens
+    Strings whose stripped lengths differ are rejected without copying them,
+    and equal-length cores are compared in place with startswith.
+    """
+    a_start, a_end = _strip_bounds(a)
+    b_start, b_end = _strip_bounds(b)
+    if a_end - a_start != b_end - b_start:
+        return False
+    # Slicing a string without surrounding whitespace returns it uncopied
+    return a.startswith(b[b_start:b_end], a_start)
+
+# Number of buffered report lines written to stdout at once
+_REPORT_CHUNK_LINES = 4096
+
+def _check_entry(task):
+    """Decode one entry and compare it with the original.
+    
+    Returns the entry index and a list of mismatch reasons, or None as the
+    reasons if the entry has no encoding map.
+    """
+    i, original_entry, encoded_entry, encoding_map = task
+    if encoding_map is None:
+        return i, None
     
-    return encoded_string
+    # Decode the encoded PDDL strings, building the decoder once for all three
+    decoder = _build_decoder(encoding_map)
+    decoded_domain = decoder(encoded_entry["instruction"])
+    decoded_problem = decoder(encoded_entry["input"])
+    decoded_plan = decoder(encoded_entry["output"])
+    
+    # Compare with the original
+    reasons = []
+    if not _stripped_eq(decoded_domain, original_entry["instruction"]):
+        reasons.append("Domain doesn't match")
+    if not _stripped_eq(decoded_problem, original_entry["input"]):
+        reasons.append("Problem doesn't match")
+    if not _stripped_eq(decoded_plan, original_entry["output"]):
+        reasons.append("Plan doesn't match")
+    return i, reasons
 
 # Function to test reversibility
-def test_reversibility(json_file, encoded_data_file, encoding_maps_file):
-    """Test if the encoding process is reversible."""
+def test_reversibility(json_file, encoded_data_file, encoding_maps_file, workers=None, verbose=False):
+    """Test if the encoding process is reversible.
+    
+    Entries are checked in parallel across `workers` processes
+    (all CPUs by default, no pool if 1). Entries that decode correctly
+    are only reported when `verbose` is set.
+    """
     print("\nTesting reversibility of the encoding process...")
     
     # Load the original JSON file
-    with open(json_file, 'r') as f:
-        original_data = json.load(f)
+    original_data = load_json(json_file)
     
     # Load the encoded data
-    with open(encoded_data_file, 'r') as f:
-        encoded_data = json.load(f)
+    encoded_data = load_json(encoded_data_file)
     
     # Load the encoding maps
-    with open(encoding_maps_file, 'r') as f:
-        encoding_maps = json.load(f)
+    encoding_maps = normalize_encoding_maps(load_json(encoding_maps_file))
     
     # Check if the number of entries match
     if len(original_data) != len(encoded_data):
@@ -56,77 +122,76 @@ def test_reversibility(json_file, encoded_data_file, encoding_maps_file):
     
     all_reversible = True
     
-    # Process each entry
-    for i, (original_entry, encoded_entry) in enumerate(zip(original_data, encoded_data)):
-        print(f"\nChecking entry {i+1}/{len(original_data)}")
-        
-        # Get the encoding map for this entry
-        map_entry = next((m for m in encoding_maps if m["entry_id"] == i), None)
-        if not map_entry:
-            print(f"ERROR: No encoding map found for entry {i}")
-            all_reversible = False
-            continue
-        
-        # Parse the encoding map
-        encoding_map = map_entry["encoding_map"]
-
-        
-
+    # Index the encoding maps by entry id
+    maps_by_id = {m["entry_id"]: m for m in encoding_maps}
+    
+    n = len(original_data)
+    tasks = [
+        (i, original_entry, encoded_entry, maps_by_id[i]["encoding_map"] if i in maps_by_id else None)
+        for i, (original_entry, encoded_entry) in enumerate(zip(original_data, encoded_data))
+    ]
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, n)
+    
+    with ExitStack() as stack:
+        if workers > 1:
+            # Importing the pool loads multiprocessing, subprocess, tempfile and shutil
+            from concurrent.futures import ProcessPoolExecutor
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            results = executor.map(_check_entry, tasks, chunksize=max(1, n // (4 * workers)))
+        else:
+            results = map(_check_entry, tasks)
         
-        # Decode the encoded PDDL strings
-        decoded_domain = decode_pddl_string(encoded_entry["instruction"], encoding_map)
-        decoded_problem = decode_pddl_string(encoded_entry["input"], encoding_map)
-        decoded_plan = decode_pddl_string(encoded_entry["output"], encoding_map)
+        # Collect the report lines and write them in large chunks instead of one print per line
+        lines = []
         
-        # print(encoded_entry["instruction"])
-        # with open("temp.pddl", "w") as f:
-        #     f.write(decoded_domain)
-        # # print(decoded_domain)
-        # # print(original_entry["instruction"])
-        # with open("temp2.pddl", "w") as f:
-        #     f.write(original_entry["instruction"])
-        # exit()
-        # Compare with the original
-        domain_match = decoded_domain.strip() == original_entry["instruction"].strip()
-        problem_match = decoded_problem.strip() == original_entry["input"].strip()
-        plan_match = decoded_plan.strip() == original_entry["output"].strip()
+        # Process each entry
+        for i, reasons in results:
+            if reasons is None:
+                lines.append(f"\nChecking entry {i+1}/{n}\n")
+                lines.append(f"ERROR: No encoding map found for entry {i}\n")
+                all_reversible = False
+            elif not reasons:
+                if verbose:
+                    lines.append(f"\nChecking entry {i+1}/{n}\n")
+                    lines.append(f"Entry {i+1}: Successfully decoded back to the original\n")
+            else:
+                lines.append(f"\nChecking entry {i+1}/{n}\n")
+                lines.append(f"Entry {i+1}: Decoding failed\n")
+                for reason in reasons:
+                    lines.append(f"  {reason}\n")
+                all_reversible = False
+            
+            if len(lines) >= _REPORT_CHUNK_LINES:
+                sys.stdout.write(''.join(lines))
+                lines.clear()
         
-        if domain_match and problem_match and plan_match:
-            print(f"Entry {i+1}: Successfully decoded back to the original")
-        else:
-            print(f"Entry {i+1}: Decoding failed")
-            if not domain_match:
-                print("  Domain doesn't match")
-            if not problem_match:
-                print("  Problem doesn't match")
-            if not plan_match:
-                print("  Plan doesn't match")
-            all_reversible = False
+        sys.stdout.write(''.join(lines))
     
     return all_reversible
 
 # Function to test if processing twice produces different encodings (with stochastic option)
 def test_stochastic_encoding(json_file):
     """Test if processing the same JSON twice with stochastic option produces different encodings."""
+    import tempfile
+    from batch_encoder import process_json_batch
+    
     print("\nTesting if stochastic encoding produces different results...")
     
     # Create temporary directories for the two runs
-    temp_dir1 = tempfile.mkdtemp()
-    temp_dir2 = tempfile.mkdtemp()
+    temp_dir1 = tempfile.mkdtemp(dir=_TEMP_ROOT)
+    temp_dir2 = tempfile.mkdtemp(dir=_TEMP_ROOT)
     
     try:
         # Run the batch encoder twice with stochastic option
-        subprocess.run([sys.executable, "batch_encoder.py", json_file, 
-                        "--output-dir", temp_dir1, "--stochastic"], check=True)
-        subprocess.run([sys.executable, "batch_encoder.py", json_file, 
-                        "--output-dir", temp_dir2, "--stochastic"], check=True)
+        process_json_batch(json_file, temp_dir1, stochastic=True)
+        process_json_batch(json_file, temp_dir2, stochastic=True)
         
         # Load the encoded data from both runs
-        with open(os.path.join(temp_dir1, "encoded_data.json"), 'r') as f:
-            encoded_data1 = json.load(f)
-        
-        with open(os.path.join(temp_dir2, "encoded_data.json"), 'r') as f:
-            encoded_data2 = json.load(f)
+        encoded_data1 = load_json(os.path.join(temp_dir1, "encoded_data.json"))
+        encoded_data2 = load_json(os.path.join(temp_dir2, "encoded_data.json"))
         
         # Check if the encodings are different
         if len(encoded_data1) != len(encoded_data2):
@@ -159,12 +224,89 @@ def test_stochastic_encoding(json_file):
     
     finally:
         # Clean up temporary directories
-        shutil.rmtree(temp_dir1)
-        shutil.rmtree(temp_dir2)
+        _remove_dir_in_background(temp_dir1)
+        _remove_dir_in_background(temp_dir2)
+
+def _write_bytes(path, text):
+    """Write text to a file as UTF-8 bytes, bypassing the text I/O layer."""
+    with open(path, 'wb') as f:
+        f.write(text.encode('utf-8'))
+
+def _write_unnamed(temp_dir, text):
+    """Write text to an unnamed O_TMPFILE file in temp_dir and return its descriptor.
+    
+    The file never appears in the directory and disappears once the descriptor
+    is closed, so nothing has to be unlinked afterwards.
+    """
+    fd = os.open(temp_dir, os.O_TMPFILE | os.O_RDWR, 0o600)
+    try:
+        data = memoryview(text.encode('utf-8'))
+        while data:
+            data = data[os.write(fd, data):]
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+# Descriptors used by each running VAL process (stdin, stdout and stderr pipes, pidfd, spare)
+_FDS_PER_VAL_RUN = 5
+# Descriptors kept free for standard streams, the event loop and the input files
+_FD_RESERVE = 16
+
+def _unnamed_fd_budget(workers):
+    """Return how many unnamed-file descriptors the VAL test may keep open at once."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return 1 << 16
+    # Reserve descriptors for the concurrent VAL processes and everything else,
+    # and only use half of what remains
+    return max(0, soft - _FD_RESERVE - _FDS_PER_VAL_RUN * workers) // 2
+
+async def _run_validate(semaphore, files, fds, open_fds):
+    """Run VAL on one domain/problem/plan tuple, limiting concurrent processes.
+    
+    Descriptors in fds are inherited by VAL, which opens them through their
+    /proc/self/fd paths in files. They are closed and removed from open_fds
+    as soon as the run completes.
+    """
+    import asyncio
+    
+    try:
+        async with semaphore:
+            process = await asyncio.create_subprocess_exec(
+                "validate", *files, pass_fds=fds,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            _, stderr = await process.communicate()
+    finally:
+        for fd in fds:
+            os.close(fd)
+            open_fds.discard(fd)
+    return process.returncode, stderr.decode(errors='replace')
+
+async def _run_validate_all(jobs, workers, open_fds):
+    """Run VAL on all (files, fds) jobs concurrently, keeping their order."""
+    import asyncio
+    
+    semaphore = asyncio.Semaphore(workers)
+    return await asyncio.gather(*(_run_validate(semaphore, *job, open_fds) for job in jobs),
+                                return_exceptions=True)
 
 # Function to test VAL validation
-def test_val_validation(json_file, encoded_data_file, encoding_maps_file):
-    """Test if VAL can validate the encoded PDDL tuples."""
+def test_val_validation(json_file, encoded_data_file, encoding_maps_file, workers=None):
+    """Test if VAL can validate the encoded PDDL tuples.
+    
+    Up to `workers` VAL processes (all CPUs by default) run at the same time.
+    On Linux the encoded PDDL is written to unnamed O_TMPFILE files passed to
+    VAL as /proc/self/fd paths; elsewhere it falls back to named files.
+    """
+    import asyncio
+    import subprocess
+    import tempfile
+    
     print("\nTesting VAL validation of encoded PDDL tuples...")
     
     # Check if VAL is available
@@ -175,72 +317,98 @@ def test_val_validation(json_file, encoded_data_file, encoding_maps_file):
         return None
     
     # Create a temporary directory for the decoded files
-    temp_dir = tempfile.mkdtemp()
+    temp_dir = tempfile.mkdtemp(dir=_TEMP_ROOT)
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    # Descriptors of the unnamed files, closed once VAL is done with them
+    open_fds = set()
+    unnamed_budget = _unnamed_fd_budget(workers) if hasattr(os, 'O_TMPFILE') else 0
+    
+    # Named files are built from this prefix with f-strings instead of os.path.join
+    temp_prefix = os.path.join(temp_dir, '')
     
     try:
-        # Load the encoded data
-        with open(encoded_data_file, 'r') as f:
-            encoded_data = json.load(f)
-        
         # Load the encoding maps
-        with open(encoding_maps_file, 'r') as f:
-            encoding_maps = json.load(f)
+        encoding_maps = normalize_encoding_maps(load_json(encoding_maps_file))
         
         all_valid = True
         
+        # Index the encoding maps by entry id
+        maps_by_id = {m["entry_id"]: m for m in encoding_maps}
+        
+        # Entry index and files to validate for every entry that has an encoding map
+        jobs = []
+        
+        # Stream the encoded entries, each one is only needed until its files are written
+        num_entries = 0
+        
         # Process each entry
-        for i, encoded_entry in enumerate(encoded_data):
-            print(f"\nValidating entry {i+1}/{len(encoded_data)}")
+        for i, encoded_entry in enumerate(iter_json_items(encoded_data_file)):
+            num_entries += 1
             
             # Get the encoding map for this entry
-            map_entry = next((m for m in encoding_maps if m["entry_id"] == i), None)
+            map_entry = maps_by_id.get(i)
             if not map_entry:
                 print(f"ERROR: No encoding map found for entry {i}")
                 all_valid = False
                 continue
             
-            # Parse the encoding map
-            encoding_map = {}
-            for line in map_entry["encoding_map"].split('\n'):
-                if line.strip():
-                    original, encoded = line.split('\t')
-                    encoding_map[encoded] = original
+            texts = (encoded_entry["instruction"], encoded_entry["input"], encoded_entry["output"])
             
-            # Write the encoded PDDL to temporary files
-            domain_file = os.path.join(temp_dir, f"domain_{i}.pddl")
-            problem_file = os.path.join(temp_dir, f"problem_{i}.pddl")
-            plan_file = os.path.join(temp_dir, f"plan_{i}.pddl")
+            # Write the encoded PDDL to unnamed files while descriptors are available
+            if len(open_fds) + 3 <= unnamed_budget:
+                fds = []
+                try:
+                    for text in texts:
+                        fds.append(_write_unnamed(temp_dir, text))
+                except OSError:
+                    # The filesystem does not support O_TMPFILE, use named files from now on
+                    for fd in fds:
+                        os.close(fd)
+                    unnamed_budget = 0
+                else:
+                    open_fds.update(fds)
+                    jobs.append((i, (tuple(f"/proc/self/fd/{fd}" for fd in fds), tuple(fds))))
+                    continue
             
-            with open(domain_file, 'w') as f:
-                f.write(encoded_entry["instruction"])
+            # Write the encoded PDDL to temporary files
+            domain_file = f"{temp_prefix}domain_{i}.pddl"
+            problem_file = f"{temp_prefix}problem_{i}.pddl"
+            plan_file = f"{temp_prefix}plan_{i}.pddl"
             
-            with open(problem_file, 'w') as f:
-                f.write(encoded_entry["input"])
+            _write_bytes(domain_file, texts[0])
+            _write_bytes(problem_file, texts[1])
+            _write_bytes(plan_file, texts[2])
             
-            with open(plan_file, 'w') as f:
-                f.write(encoded_entry["output"])
+            jobs.append((i, ((domain_file, problem_file, plan_file), ())))
+        
+        # Run VAL to validate the plans, several processes at a time
+        results = asyncio.run(_run_validate_all([job for _, job in jobs], workers, open_fds))
+        
+        for (i, _), result in zip(jobs, results):
+            print(f"\nValidating entry {i+1}/{num_entries}")
+            if isinstance(result, Exception):
+                print(f"Entry {i+1}: VAL validation error: {result}")
+                all_valid = False
+                continue
             
-            # Run VAL to validate the plan
-            try:
-                result = subprocess.run(["validate", domain_file, problem_file, plan_file], 
-                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
-                                        text=True, check=False)
-                
-                if result.returncode == 0:
-                    print(f"Entry {i+1}: VAL validation successful")
-                else:
-                    print(f"Entry {i+1}: VAL validation failed")
-                    print(f"  Error: {result.stderr}")
-                    all_valid = False
-            except Exception as e:
-                print(f"Entry {i+1}: VAL validation error: {e}")
+            returncode, stderr = result
+            if returncode == 0:
+                print(f"Entry {i+1}: VAL validation successful")
+            else:
+                print(f"Entry {i+1}: VAL validation failed")
+                print(f"  Error: {stderr}")
                 all_valid = False
         
         return all_valid
     
     finally:
-        # Clean up temporary directory
-        shutil.rmtree(temp_dir)
+        # Clean up the unnamed files and the temporary directory
+        for fd in open_fds:
+            os.close(fd)
+        _remove_dir_in_background(temp_dir)
 
 def main():
     parser = argparse.ArgumentParser(description='Test the reversibility of PDDL batch encoding.')
@@ -255,21 +423,24 @@ def main():
                         help='Test if stochastic encoding produces different results')
     parser.add_argument('--test-val', action='store_true', 
                         help='Test if VAL can validate the encoded PDDL tuples')
+    parser.add_argument('--workers', type=int, 
+                        help='Number of parallel workers for the reversibility and VAL tests (default: number of CPUs)')
+    parser.add_argument('-v', '--verbose', action='store_true', 
+                        help='Also report entries that pass the reversibility test')
     
     args = parser.parse_args()
     
-    # Convert relative paths to absolute paths
+    # Convert relative paths to absolute paths (os.path.join keeps absolute paths as they are)
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    json_file = os.path.join(script_dir, args.json_file) if not os.path.isabs(args.json_file) else args.json_file
-    encoded_data = os.path.join(script_dir, args.encoded_data) if not os.path.isabs(args.encoded_data) else args.encoded_data
-    encoding_maps = os.path.join(script_dir, args.encoding_maps) if not os.path.isabs(args.encoding_maps) else args.encoding_maps
+    json_file, encoded_data, encoding_maps = (
+        os.path.join(script_dir, path) for path in (args.json_file, args.encoded_data, args.encoding_maps))
     
     # If no specific tests are requested, run all tests
     run_all = not (args.test_reversibility or args.test_stochastic or args.test_val)
     
     # Run the requested tests
     if run_all or args.test_reversibility:
-        reversible = test_reversibility(json_file, encoded_data, encoding_maps)
+        reversible = test_reversibility(json_file, encoded_data, encoding_maps, args.workers, args.verbose)
         print(f"\nReversibility test {'PASSED' if reversible else 'FAILED'}")
     
     if run_all or args.test_stochastic:
@@ -278,7 +449,7 @@ def main():
             print(f"\nStochastic encoding test {'PASSED' if different else 'FAILED'}")
     
     if run_all or args.test_val:
-        valid = test_val_validation(json_file, encoded_data, encoding_maps)
+        valid = test_val_validation(json_file, encoded_data, encoding_maps, args.workers)
         if valid is not None:
             print(f"\nVAL validation test {'PASSED' if valid else 'FAILED'}")
 
@@ -6,20 +6,24 @@ Includes tests for reversibility and stochasticity features.
 
 import os
 import unittest
+import shutil
 import tempfile
 import filecmp
+import json_io
+import pddl_encoder
 from pddl_encoder import PDDLEncoder
+from decode_batch import PDDLDecoder, _build_decode_array, decode_pddl_string, normalize_encoding_maps
 
 class TestPDDLEncoder(unittest.TestCase):
     """Test cases for the PDDLEncoder class, including reversibility and stochasticity."""
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.encoder = PDDLEncoder()
-        self.test_dir = tempfile.mkdtemp()
+    @classmethod
+    def setUpClass(cls):
+        """Set up the read-only input files shared by all tests."""
+        cls.input_dir = tempfile.mkdtemp()
         
         # Sample PDDL content for testing
-        self.domain_content = """
+        cls.domain_content = """
 (define (domain test-domain)
   (:requirements :strips :typing)
   (:types block table - object)
@@ -35,7 +39,7 @@ class TestPDDLEncoder(unittest.TestCase):
 )
 """
         
-        self.problem_content = """
+        cls.problem_content = """
 (define (problem test-problem)
   (:domain test-domain)
   (:objects
@@ -54,14 +58,28 @@ class TestPDDLEncoder(unittest.TestCase):
 """
         
         # Create temporary files
-        self.domain_file = os.path.join(self.test_dir, "domain.pddl")
-        self.problem_file = os.path.join(self.test_dir, "problem.pddl")
+        cls.domain_file = os.path.join(cls.input_dir, "domain.pddl")
+        cls.problem_file = os.path.join(cls.input_dir, "problem.pddl")
         
-        with open(self.domain_file, "w") as f:
-            f.write(self.domain_content)
+        with open(cls.domain_file, "w") as f:
+            f.write(cls.domain_content)
         
-        with open(self.problem_file, "w") as f:
-            f.write(self.problem_content)
+        with open(cls.problem_file, "w") as f:
+            f.write(cls.problem_content)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the shared input directory."""
+        shutil.rmtree(cls.input_dir)
+
+    def setUp(self):
+        """Give each test a fresh encoder and its own directory for output files."""
+        self.encoder = PDDLEncoder()
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the test's output directory."""
+        shutil.rmtree(self.test_dir)
 
     def test_encode_name(self):
         """Test the encode_name method."""
@@ -79,6 +97,34 @@ class TestPDDLEncoder(unittest.TestCase):
         second_encoding = self.encoder.encode_name("some-name")
         self.assertEqual(first_encoding, second_encoding)
 
+    def test_encode_string(self):
+        """Test that encode_string encodes names and preserves keywords."""
+        encoded = self.encoder.encode_string("(define (domain test-domain) (:types block - object))")
+        domain_name = self.encoder.encoding_map["test-domain"]
+        block_name = self.encoder.encoding_map["block"]
+        self.assertEqual(encoded, f"(define (domain {domain_name}) (:types {block_name} - object))")
+        
+        # Encoding the same string again should reuse the existing encodings
+        self.assertEqual(self.encoder.encode_string("(block test-domain)"), f"({block_name} {domain_name})")
+
+    def test_encode_string_non_ascii(self):
+        """Test that names next to non-ASCII characters round-trip through the batch decoder."""
+        # A '-' before a non-ASCII word character must not end a name ("a-é" encodes only "a")
+        for content in ["éfoo bar", "foo_é bar", "(on blöck table)", "(on a-é b)", "(b-٣ x--é)"]:
+            encoder = PDDLEncoder(seed=3)
+            encoded = encoder.encode_string(content)
+            decoding_map = {e: o for o, e in encoder.encoding_map.items()}
+            self.assertEqual(decode_pddl_string(encoded, decoding_map), content)
+        
+    def test_read_text_memory_mapped(self):
+        """Test that PDDL files above the memory-map threshold are read unchanged."""
+        original_threshold = pddl_encoder._MMAP_THRESHOLD
+        pddl_encoder._MMAP_THRESHOLD = 1
+        try:
+            self.assertEqual(pddl_encoder._read_text(self.domain_file), self.domain_content)
+        finally:
+            pddl_encoder._MMAP_THRESHOLD = original_threshold
+
     def test_encoding_map(self):
         """Test saving and loading the encoding map."""
         # Encode some names
@@ -200,5 +246,114 @@ class TestPDDLEncoder(unittest.TestCase):
         domain_name = self.encoder.encoding_map.get("test-domain")
         self.assertIn(f"(:domain {domain_name})", encoded_problem)
 
+class TestPDDLDecoder(unittest.TestCase):
+    """Test cases for the batch decoder strategies."""
+
+    def test_indexed_decoding(self):
+        """Test that prefix + id maps are decoded by indexing the original names."""
+        decoder = PDDLDecoder({"x0": "a", "x1": "b", "x2": "c"})
+        self.assertIsNotNone(decoder.originals)
+        # Names next to '-' are separate tokens, names joined by '_' or letters are not
+        self.assertEqual(decoder("(x0 x1-x2 x1_x0 éx1 x1é x10)"), "(a b-c x1_x0 éx1 x1é x10)")
+        # Non-ASCII digits are not ids
+        self.assertEqual(decoder("(x٣ x1)"), "(x٣ b)")
+
+    def test_decode_array_rejections(self):
+        """Test that only dense, canonical prefix + id maps use the indexed path."""
+        self.assertEqual(_build_decode_array({"x1": "b", "x0": "a"}), ("x", ["a", "b"]))
+        # Leading zeros, sparse ids, mixed prefixes and non-word prefixes are rejected
+        self.assertIsNone(_build_decode_array({"x0": "a", "x01": "b"}))
+        self.assertIsNone(_build_decode_array({"x0": "a", "x1000": "b"}))
+        self.assertIsNone(_build_decode_array({"x0": "a", "y1": "b"}))
+        self.assertIsNone(_build_decode_array({"-x0": "a"}))
+        self.assertIsNone(_build_decode_array({"x": "a"}))
+
+    def test_alternation_decoding(self):
+        """Test that maps with other characters in their names are decoded with word boundaries."""
+        decoder = PDDLDecoder({"a-b": "P", "x": "Q", "a-b-c": "R"})
+        self.assertFalse(decoder.word_names)
+        self.assertIsNone(decoder.originals)
+        self.assertEqual(decoder("(a-b x a-bc a-b-c x_y)"), "(P Q a-bc R x_y)")
+
+    def test_empty_map(self):
+        """Test that an empty map leaves the string unchanged."""
+        self.assertEqual(decode_pddl_string("(x0 x1)", {}), "(x0 x1)")
+
+    def test_word_token_decoding(self):
+        """Test that maps of word-character names are decoded token by token."""
+        for encoding_map in [{"ab1": "u", "c2": "v"}, {"x0": "u", "x01": "v"}, {"x0": "u", "x1000": "v"}]:
+            decoder = PDDLDecoder(encoding_map)
+            self.assertTrue(decoder.word_names)
+            first, second = encoding_map
+            # Names next to '-' are separate tokens, names joined by '_' or letters are not
+            self.assertEqual(decoder(f"({first}-{second} {first}_{second} é{first} {second})"),
+                             f"(u-v {first}_{second} é{first} v)")
+
+    def test_normalize_encoding_maps(self):
+        """Test that tab-separated maps are converted to dicts and dicts are kept."""
+        maps = normalize_encoding_maps([
+            {"entry_id": 0, "encoding_map": "block\tx0\ntable\tx1\n"},
+            {"entry_id": 1, "encoding_map": {"block": "ab1"}},
+        ])
+        self.assertEqual(maps[0]["encoding_map"], {"block": "x0", "table": "x1"})
+        self.assertEqual(maps[1]["encoding_map"], {"block": "ab1"})
+
+class TestJSONIO(unittest.TestCase):
+    """Test cases for the JSON helpers shared by the batch tools."""
+
+    # Sample batch data with non-ASCII text, nested values and nulls
+    data = [{"instruction": "(define (domain é))", "input": "", "output": [1, {"a": None, "b": []}]}]
+
+    def setUp(self):
+        """Create a temporary directory for the JSON files written by each test."""
+        self.test_dir = tempfile.mkdtemp()
+        self.json_file = os.path.join(self.test_dir, "data.json")
+        with open(self.json_file, "wb") as f:
+            f.write(json_io.dumps(self.data, indent=True))
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.test_dir)
+
+    def test_load(self):
+        """Test that load parses a file written by dumps, with and without orjson."""
+        self.assertEqual(json_io.load(self.json_file), self.data)
+        original_orjson = json_io.orjson
+        json_io.orjson = None
+        try:
+            self.assertEqual(json_io.load(self.json_file), self.data)
+        finally:
+            json_io.orjson = original_orjson
+
+    @unittest.skipIf(json_io.orjson is None, "orjson is not installed")
+    def test_load_memory_mapped(self):
+        """Test that load parses files above the memory-map threshold."""
+        original_threshold = json_io.MMAP_THRESHOLD
+        json_io.MMAP_THRESHOLD = 1
+        try:
+            self.assertEqual(json_io.load(self.json_file), self.data)
+        finally:
+            json_io.MMAP_THRESHOLD = original_threshold
+
+    def test_iter_items(self):
+        """Test that iter_items yields the array items, with and without ijson."""
+        self.assertEqual(list(json_io.iter_items(self.json_file)), self.data)
+        original_ijson = json_io.ijson
+        json_io.ijson = None
+        try:
+            self.assertEqual(list(json_io.iter_items(self.json_file)), self.data)
+        finally:
+            json_io.ijson = original_ijson
+
+    def test_dumps_without_orjson(self):
+        """Test that dumps gives the same bytes with and without orjson."""
+        outputs = [json_io.dumps(self.data), json_io.dumps(self.data, indent=True)]
+        original_orjson = json_io.orjson
+        json_io.orjson = None
+        try:
+            self.assertEqual([json_io.dumps(self.data), json_io.dumps(self.data, indent=True)], outputs)
+        finally:
+            json_io.orjson = original_orjson
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file